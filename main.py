@@ -1,12 +1,29 @@
 from abc import ABC, abstractmethod
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import json
 import logging
-from time import sleep
+from threading import Lock
+from time import sleep, time
+from urllib.parse import urlencode
 
 from dotenv import load_dotenv
-from sqlalchemy import and_, create_engine, select, String, UniqueConstraint
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, Session
+import requests
+from requests.adapters import HTTPAdapter, Retry
+from sqlalchemy import (
+    create_engine,
+    delete,
+    event,
+    select,
+    String,
+    UniqueConstraint,
+)
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, sessionmaker
+from sqlalchemy.pool import StaticPool
 from spotipy import Spotify
+from spotipy.exceptions import SpotifyException
 from spotipy.oauth2 import SpotifyOAuth
 
 
@@ -14,14 +31,90 @@ logging.basicConfig(level=logging.INFO)
 load_dotenv(".env")
 
 
-SLEEPER = 3
-
-
 class NoGenreException(Exception):
     pass
 
 
+def call_with_backoff(func, *args, **kwargs):
+    while True:
+        try:
+            return func(*args, **kwargs)
+        except SpotifyException as e:
+            if e.http_status != 429:
+                raise
+
+            retry_after = float(e.headers.get("Retry-After", 1))
+            logging.info("Rate limited, retrying in %ss...", retry_after)
+            sleep(retry_after)
+
+
+class ETagCachingSession(requests.Session):
+    CACHEABLE = "/me/playlists"
+
+    def __init__(self, cache_path="playlists_cache.json"):
+        super().__init__()
+        retry = Retry(
+            total=3,
+            connect=None,
+            read=False,
+            status=3,
+            backoff_factor=0.3,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["GET", "POST", "PUT", "DELETE"]),
+        )
+        adapter = HTTPAdapter(max_retries=retry)
+        self.mount("http://", adapter)
+        self.mount("https://", adapter)
+        self._cache_path = cache_path
+
+        try:
+            with open(self._cache_path) as f:
+                self._etag_cache = json.load(f)
+        except (OSError, ValueError):
+            self._etag_cache = {}
+
+    def request(self, method, url, **kwargs):
+        if method.upper() != "GET" or self.CACHEABLE not in url:
+            return super().request(method, url, **kwargs)
+
+        key = self.__cache_key(url, kwargs.get("params"))
+        cached = self._etag_cache.get(key)
+
+        if cached:
+            headers = kwargs.get("headers") or {}
+            headers["If-None-Match"] = cached["etag"]
+            kwargs["headers"] = headers
+
+        response = super().request(method, url, **kwargs)
+
+        if response.status_code == 304 and cached:
+            logging.debug("ETag hit for %s", key)
+            response.status_code = 200
+            response._content = cached["body"].encode("utf-8")
+        elif response.ok and "ETag" in response.headers:
+            self._etag_cache[key] = {
+                "etag": response.headers["ETag"],
+                "body": response.text,
+            }
+            self.__save()
+
+        return response
+
+    @staticmethod
+    def __cache_key(url, params):
+        if not params:
+            return url
+
+        return f"{url}?{urlencode(sorted(params.items()))}"
+
+    def __save(self):
+        with open(self._cache_path, "w") as f:
+            json.dump(self._etag_cache, f)
+
+
 class Database:
+    METADATA_TTL = 7 * 24 * 60 * 60
+
     def __init__(self):
         class Base(DeclarativeBase):
             pass
@@ -43,56 +136,166 @@ class Database:
             id: Mapped[int] = mapped_column(primary_key=True)
             track_id: Mapped[str] = mapped_column(String(22))
 
-        self.engine = create_engine("sqlite+pysqlite:///playlists.sqlite")
+        class GenrePlaylist(Base):
+            __tablename__ = "genre_playlist"
+
+            name: Mapped[str] = mapped_column(String(255), primary_key=True)
+            playlist_id: Mapped[str] = mapped_column(String(22))
+
+        class ArtistMeta(Base):
+            __tablename__ = "artist_meta"
+
+            id: Mapped[str] = mapped_column(String(22), primary_key=True)
+            name: Mapped[str] = mapped_column(String(255))
+            genres_json: Mapped[str] = mapped_column(String(1024))
+            fetched_at: Mapped[float] = mapped_column()
+
+        class AlbumMeta(Base):
+            __tablename__ = "album_meta"
+
+            id: Mapped[str] = mapped_column(String(22), primary_key=True)
+            name: Mapped[str] = mapped_column(String(255))
+            genres_json: Mapped[str] = mapped_column(String(1024))
+            fetched_at: Mapped[float] = mapped_column()
+
+        self.engine = create_engine(
+            "sqlite+pysqlite:///playlists.sqlite",
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+
+        @event.listens_for(self.engine, "connect")
+        def set_sqlite_pragmas(dbapi_conn, _connection_record):
+            cursor = dbapi_conn.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute("PRAGMA busy_timeout=5000")
+            cursor.execute("PRAGMA temp_store=MEMORY")
+            cursor.execute("PRAGMA cache_size=-20000")
+            cursor.close()
+
         self.Base = Base
         self.PlaylistTrack = PlaylistTrack
         self.GenrelessTrack = GenrelessTrack
+        self.GenrePlaylist = GenrePlaylist
+        self.ArtistMeta = ArtistMeta
+        self.AlbumMeta = AlbumMeta
         self.__setup()
+        self.Session = sessionmaker(self.engine)
+        self.session = self.Session()
 
     def __setup(self):
         self.Base.metadata.create_all(self.engine)
 
-    def record_playlist_track(self, playlist_id, track_id):
-        playlist_track = self.PlaylistTrack(playlist_id=playlist_id, track_id=track_id)
-
-        with Session(self.engine) as session:
-            try:
-                session.add(playlist_track)
-                session.commit()
-            except:
-                pass
-
-    def check_playlist_track_exists(self, playlist_id, track_id):
-        stmt = select(self.PlaylistTrack).where(
-            and_(
-                self.PlaylistTrack.playlist_id == playlist_id,
-                self.PlaylistTrack.track_id == track_id,
+    def record_playlist_tracks(self, playlist_id, track_ids):
+        stmt = insert(self.PlaylistTrack).on_conflict_do_nothing(
+            index_elements=["playlist_id", "track_id"]
+        )
+        rows = [{"playlist_id": playlist_id, "track_id": t} for t in track_ids]
+
+        self.session.execute(stmt, rows)
+        self.session.commit()
+
+    def __load_meta(self, model):
+        cutoff = time() - self.METADATA_TTL
+        stmt = select(model).where(model.fetched_at > cutoff)
+
+        return [
+            {"id": row.id, "name": row.name, "genres": json.loads(row.genres_json)}
+            for row in self.session.scalars(stmt)
+        ]
+
+    def __record_metas(self, model, rows):
+        if not rows:
+            return
+
+        now = time()
+        stmt = insert(model)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["id"],
+            set_={
+                "name": stmt.excluded.name,
+                "genres_json": stmt.excluded.genres_json,
+                "fetched_at": stmt.excluded.fetched_at,
+            },
+        )
+        params = [
+            {
+                "id": id_,
+                "name": name,
+                "genres_json": json.dumps(genres),
+                "fetched_at": now,
+            }
+            for id_, name, genres in rows
+        ]
+
+        self.session.execute(stmt, params)
+        self.session.commit()
+
+    def load_artist_meta(self):
+        return self.__load_meta(self.ArtistMeta)
+
+    def record_artist_meta(self, id_, name, genres):
+        self.__record_metas(self.ArtistMeta, [(id_, name, genres)])
+
+    def record_artist_metas(self, rows):
+        self.__record_metas(self.ArtistMeta, rows)
+
+    def load_album_meta(self):
+        return self.__load_meta(self.AlbumMeta)
+
+    def record_album_meta(self, id_, name, genres):
+        self.__record_metas(self.AlbumMeta, [(id_, name, genres)])
+
+    def record_album_metas(self, rows):
+        self.__record_metas(self.AlbumMeta, rows)
+
+    def record_genre_playlist(self, name, playlist_id):
+        stmt = (
+            insert(self.GenrePlaylist)
+            .values(name=name, playlist_id=playlist_id)
+            .on_conflict_do_update(
+                index_elements=["name"], set_={"playlist_id": playlist_id}
             )
         )
 
-        with Session(self.engine) as session:
-            result = session.execute(stmt).first()
+        self.session.execute(stmt)
+        self.session.commit()
+
+    def load_genre_playlists(self):
+        stmt = select(self.GenrePlaylist.name, self.GenrePlaylist.playlist_id)
+
+        return self.session.execute(stmt).all()
+
+    def delete_genre_playlist(self, name):
+        stmt = delete(self.GenrePlaylist).where(self.GenrePlaylist.name == name)
 
-        if result is None:
-            return False
+        self.session.execute(stmt)
+        self.session.commit()
 
-        return True
+    def load_existing_pairs(self):
+        stmt = select(self.PlaylistTrack.playlist_id, self.PlaylistTrack.track_id)
+
+        return set(self.session.execute(stmt).all())
 
     def record_genreless_track(self, track_id):
-        genreless_track = self.GenrelessTrack(track_id=track_id)
+        stmt = (
+            insert(self.GenrelessTrack)
+            .values(track_id=track_id)
+            .on_conflict_do_nothing(index_elements=["track_id"])
+        )
 
-        with Session(self.engine) as session:
-            try:
-                session.add(genreless_track)
-                session.commit()
-            except:
-                pass
+        self.session.execute(stmt)
+        self.session.commit()
 
 
 class SpotifyCache(ABC):
-    def __init__(self, callback=lambda: None):
+    PRIME_CHUNK = 50
+
+    def __init__(self, callback=lambda: None, database=None):
         self._cache = dict()
         self._callback = callback
+        self._database = database
 
     def set_connection(self, sp, user_id):
         self.sp = sp
@@ -101,6 +304,19 @@ class SpotifyCache(ABC):
     def keys(self):
         return self._cache.keys()
 
+    def values(self):
+        return self._cache.values()
+
+    def prime(self, keys):
+        missing = [k for k in dict.fromkeys(keys) if k not in self._cache]
+
+        for i in range(0, len(missing), self.PRIME_CHUNK):
+            self._fetch_items(missing[i : i + self.PRIME_CHUNK])
+
+    def _fetch_items(self, keys):
+        for key in keys:
+            self._fetch_item(key)
+
     def __getitem__(self, _key):
         if _key not in self._cache:
             self._fetch_item(_key)
@@ -117,83 +333,150 @@ class SpotifyCache(ABC):
 
 class PlaylistCache(SpotifyCache):
     def _fetch_item(self, _key):
-        msg = f"PlaylistCache '{_key}' not found, creating..."
-        logging.info(msg)
-        pl = self.sp.user_playlist_create(self._user_id, _key, public=False)
+        logging.info("PlaylistCache '%s' not found, creating...", _key)
+        pl = call_with_backoff(self.sp.user_playlist_create, self._user_id, _key, public=False)
         pl = Playlist(pl, self.sp, self._callback)
         self._cache[_key] = pl
-        sleep(SLEEPER)
+
+        if self._database:
+            self._database.record_genre_playlist(pl.name, pl.id_)
 
 
 class ArtistCache(SpotifyCache):
+    def set_connection(self, sp, user_id):
+        super().set_connection(sp, user_id)
+
+        if self._database:
+            for item in self._database.load_artist_meta():
+                self._cache[item["id"]] = Artist(item)
+
     def _fetch_item(self, _key):
-        msg = f"ArtistCache '{_key}' not found, fetching..."
-        logging.debug(msg)
-        artist = self.sp.artist(_key)
+        logging.debug("ArtistCache '%s' not found, fetching...", _key)
+        artist = call_with_backoff(self.sp.artist, _key)
         artist = Artist(artist)
         self._cache[_key] = artist
-        sleep(SLEEPER)
+        self.__persist(artist)
+
+    def _fetch_items(self, keys):
+        logging.debug("ArtistCache priming %d artists...", len(keys))
+        artists = [
+            Artist(a) for a in call_with_backoff(self.sp.artists, keys)["artists"]
+        ]
+
+        for artist in artists:
+            self._cache[artist.id_] = artist
+
+        if self._database:
+            self._database.record_artist_metas(
+                [(a.id_, a.name, a.genres) for a in artists]
+            )
+
+    def __persist(self, artist):
+        if self._database:
+            self._database.record_artist_meta(artist.id_, artist.name, artist.genres)
 
 
 class AlbumCache(SpotifyCache):
+    PRIME_CHUNK = 20
+
+    def set_connection(self, sp, user_id):
+        super().set_connection(sp, user_id)
+
+        if self._database:
+            for item in self._database.load_album_meta():
+                self._cache[item["id"]] = Album(item)
+
     def _fetch_item(self, _key):
-        msg = f"AlbumCache '{_key}' not found, fetching..."
-        logging.debug(msg)
-        album = self.sp.album(_key)
+        logging.debug("AlbumCache '%s' not found, fetching...", _key)
+        album = call_with_backoff(self.sp.album, _key)
         album = Album(album)
         self._cache[_key] = album
-        sleep(SLEEPER)
+        self.__persist(album)
+
+    def _fetch_items(self, keys):
+        logging.debug("AlbumCache priming %d albums...", len(keys))
+        albums = [Album(a) for a in call_with_backoff(self.sp.albums, keys)["albums"]]
 
+        for album in albums:
+            self._cache[album.id_] = album
+
+        if self._database:
+            self._database.record_album_metas(
+                [(a.id_, a.name, a.genres) for a in albums]
+            )
+
+    def __persist(self, album):
+        if self._database:
+            self._database.record_album_meta(album.id_, album.name, album.genres)
 
-class SpotifyURNMixin:
-    @property
-    def urn(self):
-        return f"spotify:{self.urn_type}:{self.id_}"
 
+class Artist:
+    __slots__ = ("urn_type", "id_", "name", "genres", "urn")
 
-class Artist(SpotifyURNMixin):
     def __init__(self, api_reponse_item):
         self.urn_type = "artist"
         self.id_ = api_reponse_item["id"]
         self.name = api_reponse_item["name"]
         self.genres = api_reponse_item["genres"]
+        self.urn = f"spotify:{self.urn_type}:{self.id_}"
 
 
-class Album(SpotifyURNMixin):
+class Album:
+    __slots__ = ("urn_type", "id_", "name", "genres", "urn")
+
     def __init__(self, api_reponse_item):
         self.urn_type = "album"
         self.id_ = api_reponse_item["id"]
         self.name = api_reponse_item["name"]
         self.genres = api_reponse_item["genres"]
+        self.urn = f"spotify:{self.urn_type}:{self.id_}"
+
+
+class Track:
+    __slots__ = (
+        "urn_type",
+        "artist_cache",
+        "album_cache",
+        "id_",
+        "title",
+        "artist",
+        "album",
+        "genres",
+        "urn",
+    )
 
-
-class Track(SpotifyURNMixin):
     def __init__(self, artist_cache, album_cache, api_response_item):
         self.urn_type = "track"
         self.artist_cache = artist_cache
         self.album_cache = album_cache
 
-        self.id_ = api_response_item["track"]["id"].strip()
-        self.title = api_response_item["track"]["name"].strip()
+        self.id_ = api_response_item["track"]["id"]
+        self.urn = f"spotify:{self.urn_type}:{self.id_}"
+        self.title = api_response_item["track"]["name"]
 
-        artist_id = api_response_item["track"]["artists"][0]["id"].strip()
-        self.artist = self.__set_artist(artist_id)
-
-        album_id = api_response_item["track"]["album"]["id"].strip()
-        self.album = self.__set_album(album_id)
+        self.artist = self.__set_artist(api_response_item["track"]["artists"][0])
+        self.album = self.__set_album(api_response_item["track"]["album"])
 
         self.genres = self.__set_genres()
 
     def __str__(self):
         return f'"{self.title}" by {self.artist.name}'
 
-    def __set_artist(self, id_):
-        artist = self.artist_cache[id_]
-        return artist
+    def __set_artist(self, api_artist_item):
+        id_ = api_artist_item["id"]
+
+        if id_ not in self.artist_cache.keys() and api_artist_item.get("genres"):
+            self.artist_cache[id_] = Artist(api_artist_item)
+
+        return self.artist_cache[id_]
+
+    def __set_album(self, api_album_item):
+        id_ = api_album_item["id"]
+
+        if id_ not in self.album_cache.keys() and api_album_item.get("genres"):
+            self.album_cache[id_] = Album(api_album_item)
 
-    def __set_album(self, id_):
-        album = self.album_cache[id_]
-        return album
+        return self.album_cache[id_]
 
     def __set_genres(self):
         if self.album.genres:
@@ -202,31 +485,61 @@ class Track(SpotifyURNMixin):
         return self.artist.genres
 
 
-class Playlist(SpotifyURNMixin):
-    def __init__(self, api_response_item, sp, flush_callback=lambda: None):
+class Playlist:
+    BATCH = 100
+
+    __slots__ = (
+        "urn_type",
+        "id_",
+        "name",
+        "sp",
+        "_buf",
+        "_n",
+        "flush_callback",
+        "stale_callback",
+        "urn",
+    )
+
+    def __init__(
+        self, api_response_item, sp, flush_callback=lambda: None, stale_callback=None
+    ):
         self.urn_type = "playlist"
         self.id_ = api_response_item["id"].strip()
         self.name = api_response_item["name"].strip()
+        self.urn = f"spotify:{self.urn_type}:{self.id_}"
         self.sp = sp
-        self.tracks_to_add = []
+        self._buf = [None] * self.BATCH
+        self._n = 0
         self.flush_callback = flush_callback
+        self.stale_callback = stale_callback
 
     def add_track(self, track):
-        self.tracks_to_add.append(track)
+        self._buf[self._n] = track
+        self._n += 1
 
-        if len(self.tracks_to_add) == 100:
-            logging.info(f"Max tracks for playlist {self.name}, flushing...")
+        if self._n == self.BATCH:
+            logging.info("Max tracks for playlist %s, flushing...", self.name)
             self.flush()
-            self.tracks_to_add = []
 
     def flush(self):
-        if len(self.tracks_to_add):
-            msg = f"Flushing tracks for playlist: {self.name} ({self.id_})"
-            logging.debug(msg)
-            tracks_to_add = [t.urn for t in self.tracks_to_add]
-            self.sp.playlist_add_items(self.id_, tracks_to_add)
-            self.flush_callback(self.id_, self.tracks_to_add)
-            sleep(SLEEPER)
+        if self._n:
+            logging.debug("Flushing tracks for playlist: %s (%s)", self.name, self.id_)
+            tracks = self._buf[: self._n]
+            tracks_to_add = [t.urn for t in tracks]
+
+            try:
+                call_with_backoff(self.sp.playlist_add_items, self.id_, tracks_to_add)
+            except SpotifyException as e:
+                if e.http_status != 404 or self.stale_callback is None:
+                    raise
+
+                logging.info("Playlist %s (%s) is gone, recreating...", self.name, self.id_)
+                self.id_ = self.stale_callback(self)
+                self.urn = f"spotify:{self.urn_type}:{self.id_}"
+                call_with_backoff(self.sp.playlist_add_items, self.id_, tracks_to_add)
+
+            self.flush_callback(self.id_, tracks)
+            self._n = 0
 
     def __repr__(self):
         return f"<Playlist id={self.id_} name={self.name}>"
@@ -244,76 +557,136 @@ class ListMaker:
         self.playlist_prefix = "Liked Songs:"
         self.username = username
         self.database = Database()
-        self.playlist_cache = PlaylistCache(self.__flush_callback)
-        self.artist_cache = ArtistCache()
-        self.album_cache = AlbumCache()
+        self._flush_lock = Lock()
+        self._pl_name_cache = dict()
+        self.playlist_cache = PlaylistCache(self.__flush_callback, database=self.database)
+        self.artist_cache = ArtistCache(database=self.database)
+        self.album_cache = AlbumCache(database=self.database)
 
     def connect(self):
-        self.sp = Spotify(auth_manager=SpotifyOAuth(scope=self.scope))
+        self.sp = Spotify(
+            auth_manager=SpotifyOAuth(scope=self.scope),
+            requests_session=ETagCachingSession(),
+        )
         self.user_id = self.sp.me()["id"]
+        self._existing = self.database.load_existing_pairs()
         self.playlist_cache.set_connection(self.sp, self.user_id)
         self.artist_cache.set_connection(self.sp, self.user_id)
         self.album_cache.set_connection(self.sp, self.user_id)
+        self.__load_genre_playlists()
 
     def build_playlists(self):
-        self.__generate_liked_playlists_map()
+        if not len(self.playlist_cache.keys()):
+            self.__generate_liked_playlists_map()
+
         self.__parse_liked_songs()
         self.__flush()
 
     def __generator(self, callable):
-        offset = 0
+        def fetch(offset):
+            return call_with_backoff(callable, limit=50, offset=offset)
 
-        while True:
-            results = callable(limit=50, offset=offset)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            offset = 0
+            future = executor.submit(fetch, offset)
 
-            if len(results["items"]) == 0:
-                break
+            while True:
+                results = future.result()
 
-            yield from results["items"]
+                if len(results["items"]) == 0:
+                    break
 
-            offset = offset + 50
-            sleep(SLEEPER)
+                offset = offset + 50
+                future = executor.submit(fetch, offset)
+
+                yield from results["items"]
+
+    def __load_genre_playlists(self):
+        for name, playlist_id in self.database.load_genre_playlists():
+            pl = Playlist(
+                {"id": playlist_id, "name": name},
+                self.sp,
+                self.__flush_callback,
+                self.__stale_callback,
+            )
+            self.playlist_cache[name] = pl
+
+    def __stale_callback(self, pl):
+        with self._flush_lock:
+            self.database.delete_genre_playlist(pl.name)
+            created = call_with_backoff(
+                self.sp.user_playlist_create, self.user_id, pl.name, public=False
+            )
+            self.database.record_genre_playlist(pl.name, created["id"])
+
+        return created["id"]
 
     def __generate_liked_playlists_map(self):
         logging.debug("Generating existing genre playlist map")
+        prefix = self.playlist_prefix
+        plen = len(prefix)
 
         for pl in self.__generator(self.sp.current_user_playlists):
-            pl = Playlist(pl, self.sp, self.__flush_callback)
+            pl = Playlist(pl, self.sp, self.__flush_callback, self.__stale_callback)
 
-            if pl.name.strip().startswith(self.playlist_prefix):
+            if len(pl.name) >= plen and pl.name[:plen] == prefix:
                 self.playlist_cache[pl.name] = pl
+                self.database.record_genre_playlist(pl.name, pl.id_)
 
-        msg = f"Playlist map generated, {len(self.playlist_cache.keys())} found"
-        logging.info(msg)
+        logging.info("Playlist map generated, %d found", len(self.playlist_cache.keys()))
 
     def __parse_liked_songs(self):
-        for t in self.__generator(self.sp.current_user_saved_tracks):
-            t = Track(self.artist_cache, self.album_cache, t)
+        saved = self.__generator(self.sp.current_user_saved_tracks)
+
+        for page in iter(lambda: list(islice(saved, 50)), []):
+            self.artist_cache.prime(
+                [
+                    i["track"]["artists"][0]["id"]
+                    for i in page
+                    if not i["track"]["artists"][0].get("genres")
+                ]
+            )
+            self.album_cache.prime(
+                [
+                    i["track"]["album"]["id"]
+                    for i in page
+                    if not i["track"]["album"].get("genres")
+                ]
+            )
 
-            try:
-                self.__add_track_to_playlists(t)
-            except NoGenreException:
-                logging.info(f"NoGenreException: {t}")
-                self.database.record_genreless_track(t.id_)
+            for item in page:
+                t = Track(self.artist_cache, self.album_cache, item)
+
+                try:
+                    self.__add_track_to_playlists(t)
+                except NoGenreException:
+                    logging.info("NoGenreException: %s", t)
+                    self.database.record_genreless_track(t.id_)
 
     def __add_track_to_playlists(self, t):
         if not t.genres:
             raise NoGenreException()
 
         for genre in t.genres:
-            playlist_name = f"{self.playlist_prefix} {genre}"
+            playlist_name = self._pl_name_cache.get(genre)
+
+            if playlist_name is None:
+                playlist_name = f"{self.playlist_prefix} {genre}"
+                self._pl_name_cache[genre] = playlist_name
+
             pl = self.playlist_cache[playlist_name]
 
-            if not self.database.check_playlist_track_exists(pl.id_, t.id_):
+            if (pl.id_, t.id_) not in self._existing:
                 pl.add_track(t)
 
     def __flush(self):
-        for _, pl in self.playlist_cache.items():
-            pl.flush()
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda pl: pl.flush(), self.playlist_cache.values()))
 
     def __flush_callback(self, playlist_id, tracks):
-        for t in tracks:
-            self.database.record_playlist_track(playlist_id, t.id_)
+        with self._flush_lock:
+            self.database.record_playlist_tracks(playlist_id, [t.id_ for t in tracks])
+            self._existing.update((playlist_id, t.id_) for t in tracks)
 
 
 def get_args():